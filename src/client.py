@@ -5,7 +5,7 @@
 # Date: 6th May, 2024
 # Description:
 #     This module defines functionality for a client in a client-server architecture,
-#     which serializes data in various formats (binary, JSON, XML) and sends it over
+#     which serializes data in various formats (binary, JSON, XML, MessagePack) and sends it over
 #     a network. It handles configuration loading, data serialization according to
 #     user preferences, and encrypted text transmission.
 #
@@ -22,41 +22,133 @@
 # --------------------------------------------------------------------------------
 
 import socket
-import json
+import struct
 import pickle
-import xml.etree.ElementTree as ET
+import functools
+import mmap
+from typing import Callable, Dict, List, Tuple, Union
+from xml.sax.saxutils import escape
 import sys
 import os
+import msgspec
+import orjson
 
 # Ensure the Python environment recognizes the src directory for module imports.
-sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
-from cryptographyHelper import encrypt_message, generate_key
+_SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+if _SRC_DIR not in sys.path:
+    sys.path.insert(0, _SRC_DIR)
+from cryptographyHelper import encrypt_message, generate_key, selftest
+from messages import BUFFER_COUNT, HEADER, KEY_HEADER, SOCKET_BUFFER_SIZE
+
+# The fixed dictionary sent to the server on every connection.
+SAMPLE_DICT = {"name": "John", "age": 30, "city": "New York"}
 
 
 def load_configuration(config_path):
     """Load and return the configuration from a JSON file."""
     try:
-        with open(config_path, "r", encoding="utf-8") as config_file:
-            return json.load(config_file)
+        with open(config_path, "rb") as config_file:
+            try:
+                mapped = mmap.mmap(config_file.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                # Empty files cannot be mapped
+                return orjson.loads(config_file.read())
+            # Parse straight from the mapped pages, bypassing the buffered IO layer
+            with mapped, memoryview(mapped) as view:
+                return orjson.loads(view)
     except FileNotFoundError:
         print(f"Error: The configuration file '{config_path}' was not found.")
         sys.exit(1)
-    except json.JSONDecodeError:
+    except orjson.JSONDecodeError:
         print(f"Error: The configuration file '{config_path}' contains invalid JSON.")
         sys.exit(1)
 
 
-def serialize_data(data, format_type):
-    """Serialize data into the specified format (binary, JSON, XML)."""
-    if format_type == "binary":
-        return pickle.dumps(data)
-    elif format_type == "json":
-        return json.dumps(data).encode()
-    elif format_type == "xml":
-        root = ET.Element("dictionary")
-        for key, val in data.items():
-            ET.SubElement(root, key).text = str(val)
-        return ET.tostring(root)
+def _xml_dumps(data: dict) -> bytes:
+    """Serialize a flat dictionary into an XML document."""
+    # Format the elements directly rather than building an ElementTree; joining a
+    # list is faster than joining a generator because the size is known upfront.
+    # Per-key-set str.format/% templates were measured as no faster than this,
+    # since escaping the values dominates, and SAMPLE_DICT is cached anyway.
+    elements = "".join([f"<{key}>{escape(str(val))}</{key}>" for key, val in data.items()])
+    return f"<dictionary>{elements}</dictionary>".encode()
+
+
+PICKLE_PROTOCOL = pickle.HIGHEST_PROTOCOL
+# Built once and reused, so the encoder's state is not set up again per call.
+_MSGPACK_ENCODER = msgspec.msgpack.Encoder()
+
+# Serializers keyed by the "dictionary_format" configuration value.
+_SERIALIZERS: Dict[str, Callable[[dict], bytes]] = {
+    "binary": lambda data: pickle.dumps(data, protocol=PICKLE_PROTOCOL),
+    "json": orjson.dumps,
+    "xml": _xml_dumps,
+    "msgpack": _MSGPACK_ENCODER.encode,
+}
+
+
+def serialize_data(data: dict, format_type: str) -> bytes:
+    """
+    Serialize data into the specified format (binary, JSON, XML, MessagePack).
+
+    For "binary" this is a bare pickle stream. The server expects the framed form
+    built by `serialize_data_parts`, which is the wire format for every format.
+    """
+    try:
+        serializer = _SERIALIZERS[format_type]
+    except KeyError:
+        raise ValueError(f"Unsupported dictionary format: {format_type}") from None
+    return serializer(data)
+
+
+def serialize_data_parts(data: dict, format_type: str) -> List[Union[bytes, memoryview]]:
+    """
+    Serialize data into the list of buffers that make up its wire representation.
+
+    The binary format uses pickle protocol 5 out-of-band buffers: pickle.PickleBuffer
+    values in the data (and objects that export them, such as NumPy arrays) are
+    returned as separate zero-copy views to hand straight to sendmsg, instead of
+    being copied into the pickle stream. The frame starts with the buffer count and
+    lengths so the server can split them.
+    Every other format is returned as a single buffer.
+    """
+    if format_type != "binary":
+        return [serialize_data(data, format_type)]
+    pickle_buffers: List[pickle.PickleBuffer] = []
+    stream = pickle.dumps(data, protocol=PICKLE_PROTOCOL, buffer_callback=pickle_buffers.append)
+    raw_buffers = [buffer.raw() for buffer in pickle_buffers]
+    lengths = struct.pack(f"!{len(raw_buffers)}I", *map(len, raw_buffers))
+    return [BUFFER_COUNT.pack(len(raw_buffers)) + lengths, stream, *raw_buffers]
+
+
+@functools.lru_cache(maxsize=None)
+def session_key() -> bytes:
+    """Return the encryption key for this process, generated on first use."""
+    return generate_key()
+
+
+@functools.lru_cache(maxsize=None)
+def serialized_sample(format_type: str) -> Tuple[Union[bytes, memoryview], ...]:
+    """Return the wire buffers for SAMPLE_DICT in the given format, computed once per format."""
+    return tuple(serialize_data_parts(SAMPLE_DICT, format_type))
+
+
+def configure_socket(sock):
+    """Disable Nagle's algorithm and size the kernel buffers for small, latency-bound messages."""
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, SOCKET_BUFFER_SIZE)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, SOCKET_BUFFER_SIZE)
+
+
+def send_message(sock, dict_parts, text_parts):
+    """Send the length-prefixed dictionary and text payload parts with one sendmsg call."""
+    dict_length = sum(map(len, dict_parts))
+    text_length = sum(map(len, text_parts))
+    buffers = [HEADER.pack(dict_length, text_length), *dict_parts, *text_parts]
+    sent = sock.sendmsg(buffers)
+    if sent < HEADER.size + dict_length + text_length:
+        # The kernel accepted only part of the message; push out the remainder.
+        sock.sendall(b"".join(buffers)[sent:])
 
 
 def main():
@@ -65,28 +157,32 @@ def main():
         os.path.dirname(os.path.realpath(__file__)), "config.json"
     )
     config = load_configuration(config_path)
+    if config["encrypt_text_file"]:
+        print(selftest())
 
     host = "localhost"
     port = 12345
     client_socket = socket.socket()
+    configure_socket(client_socket)
 
     try:
         client_socket.connect((host, port))
         print("Connected to server.")
 
-        # Dictionary data serialization and sending
-        sample_dict = {"name": "John", "age": 30, "city": "New York"}
-        serialized_dict = serialize_data(sample_dict, config["dictionary_format"])
-        client_socket.sendall(serialized_dict)
+        # Dictionary data serialization (cached after the first connection)
+        dict_parts = serialized_sample(config["dictionary_format"])
 
-        # Text file data handling and sending
+        # Text file data handling
         text_data = "Hello, this is a sample text file content."
         if config["encrypt_text_file"]:
-            key = generate_key()
+            key = session_key()
             encrypted_text = encrypt_message(text_data, key)
-            client_socket.sendall(key + b"|||" + encrypted_text)
+            text_parts = [KEY_HEADER.pack(len(key)), key, encrypted_text]
         else:
-            client_socket.sendall(text_data.encode())
+            text_parts = [text_data.encode()]
+
+        # Send the header and both payloads in a single scatter-gather call
+        send_message(client_socket, dict_parts, text_parts)
 
     except socket.error as e:
         print(f"Socket error: {e}")
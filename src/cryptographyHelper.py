@@ -1,41 +1,117 @@
-from cryptography.fernet import Fernet
+import functools
+import os
+from typing import Optional, Union
 
+from cryptography.hazmat.backends.openssl import backend
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
 
-def generate_key():
+KEY_SIZE = 16  # AES-128
+NONCE_SIZE = 12  # The 96-bit nonce recommended for GCM
+
+# Known-answer test vector: test case 2 of the NIST GCM specification
+# (all-zero key, nonce and plaintext).
+_SELFTEST_CIPHERTEXT = bytes.fromhex(
+    "0388dace60b6a392f328c2b971b2fe78ab6e47d42cec13bdf53a67b21257bddf"
+)
+
+
+def generate_key() -> bytes:
     """
-    Generate a secret key for symmetric encryption using the Fernet scheme.
+    Generate a secret key for symmetric encryption using AES-128-GCM.
 
     Returns:
-        bytes: A URL-safe base64-encoded 32-byte key.
+        bytes: A random 16-byte key.
     """
-    return Fernet.generate_key()
+    return AESGCM.generate_key(bit_length=KEY_SIZE * 8)
 
 
-def encrypt_message(message, key):
+@functools.lru_cache(maxsize=32)
+def get_cipher(key: bytes) -> AESGCM:
     """
-    Encrypt a message using a Fernet key.
+    Return an AESGCM instance for the given key, building it only once per key.
+
+    Args:
+        key (bytes): The AES key, should be generated by `generate_key`.
+
+    Returns:
+        AESGCM: A reusable AESGCM instance bound to the key.
+    """
+    return AESGCM(key)
+
+
+def encrypt_message(message: str, key: bytes) -> bytes:
+    """
+    Encrypt a message using AES-128-GCM.
 
     Args:
         message (str): The plaintext message to encrypt.
-        key (bytes): The Fernet key used to encrypt the message, should be generated by `generate_key`.
+        key (bytes): The AES key used to encrypt the message, should be generated by `generate_key`.
 
     Returns:
-        bytes: The encrypted message, which is URL-safe base64-encoded.
+        bytes: A fresh random nonce followed by the ciphertext and authentication tag.
     """
-    f = Fernet(key)
-    return f.encrypt(message.encode())
+    nonce = os.urandom(NONCE_SIZE)
+    return nonce + get_cipher(key).encrypt(nonce, message.encode(), None)
 
 
-def decrypt_message(encrypted_message, key):
+def decrypt_message(encrypted_message: Union[bytes, memoryview], key: bytes) -> str:
     """
-    Decrypt a message encrypted with Fernet symmetric encryption.
+    Decrypt and authenticate a message encrypted with `encrypt_message`.
 
     Args:
-        encrypted_message (bytes): The encrypted message to decrypt.
-        key (bytes): The Fernet key used for decryption, should match the encryption key.
+        encrypted_message (bytes or memoryview): The nonce followed by the ciphertext and
+            authentication tag, such as a slice of the server's receive buffer.
+        key (bytes): The AES key used for decryption, should match the encryption key.
 
     Returns:
         str: The decrypted plaintext message.
+
+    Raises:
+        cryptography.exceptions.InvalidTag: If the message was tampered with or the key is wrong.
+    """
+    nonce = encrypted_message[:NONCE_SIZE]
+    ciphertext = encrypted_message[NONCE_SIZE:]
+    return get_cipher(key).decrypt(nonce, ciphertext, None).decode()
+
+
+def cpu_has_aes_instructions() -> Optional[bool]:
     """
-    f = Fernet(key)
-    return f.decrypt(encrypted_message).decode()
+    Report whether the CPU advertises hardware AES support (AES-NI or ARMv8 AES).
+
+    Returns:
+        bool or None: True or False on Linux, None where /proc/cpuinfo is unavailable.
+    """
+    try:
+        with open("/proc/cpuinfo", "r") as cpuinfo:
+            for line in cpuinfo:
+                # x86 lists CPU features under "flags", ARM under "Features"
+                name, _, values = line.partition(":")
+                if name.strip() in ("flags", "Features"):
+                    return "aes" in values.split()
+    except OSError:
+        return None
+    return None
+
+
+def selftest() -> str:
+    """
+    Run a known-answer test through OpenSSL and describe the AES implementation in use.
+
+    Returns:
+        str: A one-line summary of the OpenSSL version and hardware AES support.
+
+    Raises:
+        RuntimeError: If AES-GCM does not produce the expected ciphertext.
+    """
+    zeros = bytes(KEY_SIZE)
+    if AESGCM(zeros).encrypt(bytes(NONCE_SIZE), zeros, None) != _SELFTEST_CIPHERTEXT:
+        raise RuntimeError("AES-GCM self-test failed: unexpected ciphertext.")
+
+    hardware_aes = cpu_has_aes_instructions()
+    if hardware_aes is None:
+        acceleration = "hardware AES support unknown"
+    elif hardware_aes:
+        acceleration = "hardware AES available"
+    else:
+        acceleration = "no hardware AES, using software fallback"
+    return f"AES-GCM self-test passed ({backend.openssl_version_text()}, {acceleration})"
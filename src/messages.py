@@ -0,0 +1,28 @@
+# --------------------------------------------------------------------------------
+# Message Schemas Shared by the Client and Server
+# --------------------------------------------------------------------------------
+# Description:
+#     The wire framing and typed definitions of the records exchanged between the
+#     client and server. msgspec builds its C encoders and decoders from the
+#     records, so MessagePack payloads are validated while they are decoded.
+# --------------------------------------------------------------------------------
+
+import struct
+import msgspec
+
+# Every message starts with the lengths of the dictionary and text payloads.
+HEADER = struct.Struct("!II")
+# Encrypted text payloads start with the length of the key that precedes the ciphertext.
+KEY_HEADER = struct.Struct("!I")
+# Binary dictionaries start with the number of out-of-band pickle buffers, then their lengths.
+BUFFER_COUNT = struct.Struct("!I")
+# Send and receive buffer size for both ends, large enough for a message in a few syscalls.
+SOCKET_BUFFER_SIZE = 1 << 20
+
+
+class Person(msgspec.Struct):
+    """The sample dictionary sent by the client on every connection."""
+
+    name: str
+    age: int
+    city: str
@@ -22,14 +22,40 @@
 #     data as clients connect and send information.
 # --------------------------------------------------------------------------------
 
+import asyncio
+import errno
+import io
+import mmap
+import multiprocessing
+import multiprocessing.connection
+import selectors
 import socket
-import json
+import struct
+import time
+import pickle
+import xml.etree.ElementTree as ET
 import sys
 import os
+import msgspec
+import orjson
 
 # Ensure that Python can find and load other modules from the src directory
-sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src")))
-from cryptographyHelper import decrypt_message
+_SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+if _SRC_DIR not in sys.path:
+    sys.path.insert(0, _SRC_DIR)
+from cryptographyHelper import decrypt_message, selftest
+from messages import BUFFER_COUNT, HEADER, KEY_HEADER, SOCKET_BUFFER_SIZE, Person
+
+# Largest message a client may announce; its whole buffer is allocated up front.
+MAX_MESSAGE_SIZE = 16 << 20
+# Seconds a client has to deliver its complete message before it is disconnected.
+CLIENT_TIMEOUT = 10.0
+# Seconds between sweeps for expired clients in the selector loop.
+SWEEP_INTERVAL = 1.0
+# accept() errors that mean the process is out of resources rather than a bad peer.
+_RESOURCE_ERRORS = (errno.EMFILE, errno.ENFILE, errno.ENOBUFS, errno.ENOMEM)
+# Workers that fail sooner than this after starting (e.g. the port is taken) are not restarted.
+MIN_WORKER_LIFETIME = 1.0
 
 
 def load_configuration(file_path):
@@ -48,68 +74,510 @@ def load_configuration(file_path):
                       Returns None if the file does not exist or an error occurs during JSON decoding.
     """
     try:
-        with open(file_path, "r") as file:
-            return json.load(file)
+        with open(file_path, "rb") as file:
+            try:
+                mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                # Empty files cannot be mapped
+                return orjson.loads(file.read())
+            # Parse straight from the mapped pages, bypassing the buffered IO layer
+            with mapped, memoryview(mapped) as view:
+                return orjson.loads(view)
     except FileNotFoundError:
         print("Missing 'config.json' file.")
         return None
-    except json.JSONDecodeError:
+    except orjson.JSONDecodeError:
         print("Error decoding 'config.json'. Check its format.")
         return None
 
 
+class _RestrictedUnpickler(pickle.Unpickler):
+    """
+    Unpickler that refuses to import any class or function.
+
+    Unpickling data from the network with `pickle.loads` lets the sender run
+    arbitrary code. Rejecting every global still decodes the built-in containers
+    and scalars (dict, list, str, int, bytes, ...) the client sends.
+    """
+
+    def find_class(self, module, name):
+        raise pickle.UnpicklingError(f"Refusing to load {module}.{name} from a client.")
+
+
+def _pickle_loads(data):
+    """Unpickle a protocol 5 stream framed with its out-of-band buffers."""
+    (count,) = BUFFER_COUNT.unpack_from(data)
+    lengths = struct.unpack_from(f"!{count}I", data, BUFFER_COUNT.size)
+    stream_start = BUFFER_COUNT.size + 4 * count
+    stream_end = len(data) - sum(lengths)
+    # Slice the buffers out of the received message without copying them
+    buffers = []
+    offset = stream_end
+    for length in lengths:
+        buffers.append(data[offset:offset + length])
+        offset += length
+    stream = io.BytesIO(data[stream_start:stream_end])
+    return _RestrictedUnpickler(stream, buffers=buffers).load()
+
+
+# Decodes and validates MessagePack payloads against the Person schema in C.
+_PERSON_DECODER = msgspec.msgpack.Decoder(Person)
+
+# Deserializers keyed by the "dictionary_format" configuration value.
+_DESERIALIZERS = {
+    "binary": _pickle_loads,
+    "json": orjson.loads,
+    "xml": lambda data: {child.tag: child.text for child in ET.fromstring(data)},
+    "msgpack": _PERSON_DECODER.decode,
+}
+
+
+def deserialize_data(data, format_type):
+    """
+    Deserialize a dictionary received in the specified format.
+
+    Args:
+        data (bytes): The serialized dictionary as sent by the client.
+        format_type (str): One of "binary", "json", "xml" or "msgpack".
+
+    Returns:
+        dict or Person: The deserialized dictionary. XML values are returned as
+                        strings, and MessagePack payloads as a validated Person.
+
+    Raises:
+        ValueError: If the format is not supported.
+        msgspec.ValidationError: If a MessagePack payload does not match Person.
+        pickle.UnpicklingError: If a binary payload references any class or function.
+    """
+    try:
+        deserializer = _DESERIALIZERS[format_type]
+    except KeyError:
+        raise ValueError(f"Unsupported dictionary format: {format_type}") from None
+    return deserializer(data)
+
+
 def process_incoming_data(encrypt):
     """Simple logic to simulate data processing depending on the encryption setting."""
     return "Processed data based on encryption setting"
 
 
-def main():
-    """Main function to set up and run the server."""
-    host = ""  # Bind to all interfaces
-    port = 12345
+def configure_socket(sock):
+    """Disable Nagle's algorithm and size the kernel buffers for small, latency-bound messages."""
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, SOCKET_BUFFER_SIZE)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, SOCKET_BUFFER_SIZE)
+
+
+def configure_connection(conn):
+    """
+    Apply the options an accepted connection does not inherit from the listener.
+
+    TCP_NODELAY and the buffer sizes are inherited from the listening socket, so
+    only TCP_QUICKACK, which the kernel does not carry over, is set here.
+    """
+    if hasattr(socket, "TCP_QUICKACK"):
+        # Linux only: acknowledge immediately instead of delaying the ACK.
+        conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_QUICKACK, 1)
+
+
+async def recv_exact_async(loop, conn, view, nbytes):
+    """
+    Receive exactly `nbytes` bytes from a non-blocking socket into a preallocated buffer.
+
+    Args:
+        loop (asyncio.AbstractEventLoop): The running event loop.
+        conn (socket.socket): The connected, non-blocking client socket.
+        view (memoryview): A writable view over the receive buffer.
+        nbytes (int): The number of bytes to read.
+
+    Returns:
+        memoryview: A view over the first `nbytes` bytes of the buffer.
+
+    Raises:
+        ValueError: If the message does not fit in the receive buffer.
+        ConnectionError: If the client closes the connection early.
+    """
+    if nbytes > len(view):
+        raise ValueError(f"Message of {nbytes} bytes exceeds the receive buffer.")
+    received = 0
+    while received < nbytes:
+        count = await loop.sock_recv_into(conn, view[received:nbytes])
+        if count == 0:
+            raise ConnectionError("Connection closed before the message was complete.")
+        received += count
+    return view[:nbytes]
+
+
+def process_message(config, received_dict, received_text):
+    """
+    Decode, print and optionally store one message received from a client.
+
+    Args:
+        config (dict): The server configuration.
+        received_dict (bytes-like): The serialized dictionary payload.
+        received_text (bytes-like): The plain or encrypted text payload.
+    """
+    dictionary = deserialize_data(received_dict, config.get("dictionary_format"))
+    print("Received dictionary:", dictionary)
+
+    if config.get("encrypt_text_file"):
+        (key_length,) = KEY_HEADER.unpack_from(received_text)
+        key_end = KEY_HEADER.size + key_length
+        key = bytes(received_text[KEY_HEADER.size:key_end])
+        encrypted_text = received_text[key_end:]
+        text = decrypt_message(encrypted_text, key)
+        print("Received encrypted text:", text)
+        # The raw key and ciphertext are not readable, so store the plaintext
+        output_text = text.encode()
+    else:
+        print("Received text:", str(received_text, "utf-8"))
+        output_text = received_text
+
+    if config.get("server_output") == "file":
+        # Append the payloads as received, without decoding them to str first. The
+        # record goes out in a single write so concurrent workers do not interleave.
+        record = b"".join([received_dict, b"\n", output_text, b"\n"])
+        with open(config["server_output_file"], "ab") as file:
+            file.write(record)
+
+
+def allocate_message(header):
+    """
+    Unpack a message header and allocate a buffer sized to the payloads it announces.
+
+    Args:
+        header (bytes-like): The HEADER.size bytes that start every message.
+
+    Returns:
+        tuple: The dictionary length and a bytearray for the dictionary and text payloads.
+
+    Raises:
+        ValueError: If the announced message is larger than MAX_MESSAGE_SIZE.
+    """
+    dict_length, text_length = HEADER.unpack(header)
+    if dict_length + text_length > MAX_MESSAGE_SIZE:
+        raise ValueError(
+            f"Message of {dict_length + text_length} bytes exceeds {MAX_MESSAGE_SIZE} bytes."
+        )
+    return dict_length, bytearray(dict_length + text_length)
+
+
+async def recv_message_async(loop, conn):
+    """Receive one framed message, returning the dictionary length and the payload."""
+    # Read the small header first so the payload buffer can be sized exactly
+    header = memoryview(bytearray(HEADER.size))
+    await recv_exact_async(loop, conn, header, HEADER.size)
+    dict_length, buffer = allocate_message(header)
+    message = memoryview(buffer)
+    await recv_exact_async(loop, conn, message, len(message))
+    return dict_length, message
+
+
+async def handle_connection_async(loop, conn, addr, config):
+    """Receive and process one message from a client without blocking the event loop."""
+    try:
+        with conn:
+            print(f"Connected by {addr}")
+            configure_connection(conn)
+            dict_length, message = await asyncio.wait_for(
+                recv_message_async(loop, conn), CLIENT_TIMEOUT
+            )
+            process_message(config, message[:dict_length], message[dict_length:])
+    except asyncio.TimeoutError:
+        print(f"Connection from {addr} timed out.")
+    except socket.error as e:
+        print(f"Connection error: {e}")
+    except Exception as e:
+        print(f"Error processing data: {e}")
 
+
+def create_server_socket(host, port, backlog, reuse_port=False):
+    """
+    Create a tuned listening socket, exiting the program if it cannot be bound.
+
+    Args:
+        host (str): The interface to bind to, or "" for all interfaces.
+        port (int): The TCP port to listen on.
+        backlog (int): The maximum number of pending connections.
+        reuse_port (bool): Set SO_REUSEPORT so several processes can listen on the
+                           same port, with the kernel balancing connections across them.
+
+    Returns:
+        socket.socket: The listening socket.
+    """
     server_socket = socket.socket()
+    server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    if reuse_port:
+        server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    # Accepted connections inherit TCP_NODELAY and the buffer sizes from the listener
+    configure_socket(server_socket)
     try:
         server_socket.bind((host, port))
-        server_socket.listen(1)
+        server_socket.listen(backlog)
         print("Server is listening for incoming connections...")
     except socket.error as e:
         print(f"Failed to bind or listen on port {port}: {e}")
         sys.exit(1)
+    return server_socket
 
-    try:
-        conn, addr = server_socket.accept()
-        print(f"Connected by {addr}")
 
-        config = load_configuration("config.json")
-        if config is None:
+class ClientConnection:
+    """
+    Read progress of one client served by the selector loop.
+
+    The socket is non-blocking and only read when the selector reports data, so a
+    client that sends part of a message and stalls never blocks other clients.
+    The header is read first; the dictionary and text payloads then go into one
+    buffer sized to the lengths it announces. A client that has not delivered
+    its whole message by `deadline` is closed by `close_expired`, so idle or
+    trickling peers cannot hold file descriptors forever.
+    """
+
+    def __init__(self, conn, addr):
+        self.conn = conn
+        self.addr = addr
+        self.deadline = time.monotonic() + CLIENT_TIMEOUT
+        self.buffer = bytearray(HEADER.size)
+        self.received = 0
+        self.dict_length = None  # Known once the header has been read
+
+    def read(self, config):
+        """
+        Read whatever the client has sent and process the message once complete.
+
+        Args:
+            config (dict): The server configuration.
+
+        Returns:
+            bool: True once the message has been processed and the connection can close.
+
+        Raises:
+            ValueError: If the announced message is larger than MAX_MESSAGE_SIZE.
+            ConnectionError: If the client closes the connection early.
+        """
+        if self.received < len(self.buffer):
+            try:
+                count = self.conn.recv_into(memoryview(self.buffer)[self.received:])
+            except BlockingIOError:
+                return False
+            if count == 0:
+                raise ConnectionError("Connection closed before the message was complete.")
+            self.received += count
+            if self.received < len(self.buffer):
+                return False
+
+        if self.dict_length is None:
+            self.dict_length, self.buffer = allocate_message(self.buffer)
+            self.received = 0
+            if self.buffer:
+                return False
+
+        message = memoryview(self.buffer)
+        process_message(config, message[:self.dict_length], message[self.dict_length:])
+        return True
+
+
+def accept_pending(server_socket, selector):
+    """
+    Accept every connection waiting on the listening socket and watch it for data.
+
+    Returns:
+        bool: False if accepting failed because the process ran out of resources,
+              such as file descriptors, and the caller should stop accepting for a while.
+    """
+    while True:
+        try:
+            conn, addr = server_socket.accept()
+        except BlockingIOError:
+            return True
+        except OSError as e:
+            print(f"Failed to accept a connection: {e}")
+            if e.errno in _RESOURCE_ERRORS:
+                return False
+            continue
+        print(f"Connected by {addr}")
+        try:
+            configure_connection(conn)
+            conn.setblocking(False)
+        except OSError as e:
+            print(f"Failed to set up the connection from {addr}: {e}")
             conn.close()
-            return
-
-        received_dict = conn.recv(1024)
-        print("Received dictionary:", received_dict.decode())
-
-        received_text = conn.recv(1024)
-        if config.get("encrypt_text_file"):
-            key, encrypted_text = received_text.split(b"|||", 1)
-            decrypted_text = decrypt_message(encrypted_text, key)
-            print("Received encrypted text:", decrypted_text)
-        else:
-            print("Received text:", received_text.decode())
-
-        if config.get("server_output") == "file":
-            with open(config["server_output_file"], "w", encoding="utf-8") as file:
-                file.write(
-                    str(received_dict.decode()) + "\n" + str(received_text.decode())
-                )
+            continue
+        selector.register(conn, selectors.EVENT_READ, ClientConnection(conn, addr))
+
+
+def close_expired(selector, now):
+    """Close every client that has not delivered its message before its deadline."""
+    for key in list(selector.get_map().values()):
+        client = key.data
+        if client is not None and now >= client.deadline:
+            print(f"Connection from {client.addr} timed out.")
+            selector.unregister(client.conn)
+            client.conn.close()
+
+
+def serve_client(client, config, selector):
+    """Advance a readable client connection, closing it once it is done or has failed."""
+    try:
+        finished = client.read(config)
     except socket.error as e:
         print(f"Connection error: {e}")
+        finished = True
     except Exception as e:
         print(f"Error processing data: {e}")
+        finished = True
+    if finished:
+        selector.unregister(client.conn)
+        client.conn.close()
+
+
+def worker(host, port, config, reuse_port=False):
+    """
+    Listen on its own socket and serve clients until interrupted.
+
+    Each worker owns its listening socket, selector and client connections, so
+    several workers can run in separate processes without sharing any state.
+
+    Args:
+        host (str): The interface to bind to, or "" for all interfaces.
+        port (int): The TCP port to listen on.
+        config (dict): The server configuration.
+        reuse_port (bool): Whether other workers share the port via SO_REUSEPORT.
+    """
+    server_socket = create_server_socket(host, port, socket.SOMAXCONN, reuse_port)
+    server_socket.setblocking(False)
+
+    selector = selectors.DefaultSelector()
+    selector.register(server_socket, selectors.EVENT_READ)
+    accepting = True
+    next_sweep = time.monotonic() + SWEEP_INTERVAL
+    try:
+        while True:
+            for key, _ in selector.select(timeout=SWEEP_INTERVAL):
+                if key.fileobj is server_socket:
+                    if not accept_pending(server_socket, selector):
+                        # The listener stays readable while accept() fails, so stop
+                        # watching it until the next sweep instead of spinning
+                        selector.unregister(server_socket)
+                        accepting = False
+                else:
+                    serve_client(key.data, config, selector)
+
+            now = time.monotonic()
+            if now >= next_sweep:
+                close_expired(selector, now)
+                if not accepting:
+                    selector.register(server_socket, selectors.EVENT_READ)
+                    accepting = True
+                next_sweep = now + SWEEP_INTERVAL
+    except KeyboardInterrupt:
+        print("Server stopped.")
     finally:
-        conn.close()
+        for key in list(selector.get_map().values()):
+            key.fileobj.close()
+        selector.close()
         server_socket.close()
 
 
+def main():
+    """Main function to set up and run the server until interrupted."""
+    host = ""  # Bind to all interfaces
+    port = 12345
+
+    config = load_configuration("config.json")
+    if config is None:
+        return
+    if config.get("encrypt_text_file"):
+        print(selftest())
+
+    # 0 or a missing setting means one worker per CPU core
+    worker_count = config.get("server_workers") or os.cpu_count() or 1
+    # Only Linux balances connections across SO_REUSEPORT listeners; elsewhere the
+    # first worker to bind would receive them all
+    if worker_count == 1 or not sys.platform.startswith("linux"):
+        worker(host, port, config)
+        return
+    run_workers(host, port, config, worker_count)
+
+
+def run_workers(host, port, config, worker_count):
+    """
+    Run a pool of worker processes sharing the port, restarting any that crash.
+
+    A worker that exits with code 0 has been stopped with Ctrl+C and is not
+    replaced. The function returns once every worker has stopped.
+
+    Args:
+        host (str): The interface to bind to, or "" for all interfaces.
+        port (int): The TCP port to listen on.
+        config (dict): The server configuration.
+        worker_count (int): The number of worker processes to keep running.
+    """
+    def start_worker():
+        process = multiprocessing.Process(target=worker, args=(host, port, config, True))
+        process.start()
+        started[process.sentinel] = (process, time.monotonic())
+
+    started = {}
+    for _ in range(worker_count):
+        start_worker()
+    try:
+        while started:
+            for sentinel in multiprocessing.connection.wait(list(started)):
+                process, start_time = started.pop(sentinel)
+                process.join()
+                if process.exitcode == 0:
+                    continue
+                print(f"Worker {process.pid} exited with code {process.exitcode}.")
+                if time.monotonic() - start_time < MIN_WORKER_LIFETIME:
+                    print("The worker failed right after starting, so it is not restarted.")
+                else:
+                    start_worker()
+    except KeyboardInterrupt:
+        # Ctrl+C reaches every worker in the process group; wait for them to exit
+        for process, _ in started.values():
+            process.join(timeout=5)
+            if process.is_alive():  # Restarted after the signal was delivered
+                process.terminate()
+                process.join()
+
+
+async def main_async():
+    """Alternative to `main` that serves many clients concurrently on an event loop."""
+    host = ""  # Bind to all interfaces
+    port = 12345
+
+    config = load_configuration("config.json")
+    if config is None:
+        return
+    if config.get("encrypt_text_file"):
+        print(selftest())
+
+    server_socket = create_server_socket(host, port, socket.SOMAXCONN)
+    server_socket.setblocking(False)
+
+    loop = asyncio.get_running_loop()
+    tasks = set()  # Keep references so running handlers are not garbage collected
+    with server_socket:
+        while True:
+            try:
+                conn, addr = await loop.sock_accept(server_socket)
+            except OSError as e:
+                print(f"Failed to accept a connection: {e}")
+                if e.errno in _RESOURCE_ERRORS:
+                    # Give running handlers time to finish or time out and free descriptors
+                    await asyncio.sleep(SWEEP_INTERVAL)
+                continue
+            task = loop.create_task(handle_connection_async(loop, conn, addr, config))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+
+
 if __name__ == "__main__":
-    main()
+    if "--async" in sys.argv[1:]:
+        try:
+            asyncio.run(main_async())
+        except KeyboardInterrupt:
+            print("Server stopped.")
+    else:
+        main()
@@ -6,7 +6,7 @@
 # Description:
 #     This script provides unit tests for the client module, which handles data
 #     serialization and network communication with a server. The tests cover
-#     serialization in binary, JSON, and XML formats and include performance 
+#     serialization in binary, JSON, XML, and MessagePack formats and include performance 
 #     measurements to compare the execution time for each serialization method.
 #     Additionally, it ensures that the client's main function appropriately 
 #     manages socket connections and sends data as expected.
@@ -16,7 +16,9 @@
 #     using mocks for socket methods to ensure that no actual network communication
 #     is performed during the tests. The inclusion of timing measurements provides
 #     insights into the performance characteristics of each serialization method,
-#     aiding in the selection of the most efficient approach.
+#     aiding in the selection of the most efficient approach. A separate benchmark
+#     pipelines many payloads over one persistent local connection, so that the
+#     serialization path is timed rather than connection setup.
 #
 # Usage:
 #     Run this script directly to execute all unit tests for the client module.
@@ -27,27 +29,93 @@
 import unittest
 from unittest.mock import patch, MagicMock
 import os
+import socket
 import sys
 import json
 import xml.etree.ElementTree as ET
 import pickle
+import threading
 import time
+import msgspec
 
-# Append the path to the src directory so that Python can find the modules
-sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+# Add the src directory to the path once so that Python can find the modules
+src_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src')
+if src_dir not in sys.path:
+    sys.path.insert(0, src_dir)
 import client  # Import module
 
+class BenchmarkClient:
+    """Keep one local TCP connection open and pipeline serialized payloads over it."""
+
+    def __init__(self):
+        self.listener = socket.create_server(('127.0.0.1', 0))
+        self.drain_thread = threading.Thread(target=self._drain, daemon=True)
+        self.drain_thread.start()
+        self.sock = socket.create_connection(self.listener.getsockname())
+        client.configure_socket(self.sock)
+
+    def _drain(self):
+        """Read and discard everything the client sends until it disconnects."""
+        conn, _ = self.listener.accept()
+        with conn:
+            buffer = bytearray(client.SOCKET_BUFFER_SIZE)
+            while conn.recv_into(buffer):
+                pass
+
+    def run(self, data, format_type, iterations=10_000):
+        """Serialize and send data as full wire messages and return the rate in ops/sec."""
+        start_time = time.perf_counter_ns()
+        for _ in range(iterations):
+            client.send_message(self.sock, client.serialize_data_parts(data, format_type), [])
+        elapsed_ns = time.perf_counter_ns() - start_time
+        return iterations * 1_000_000_000 / elapsed_ns
+
+    def close(self):
+        self.sock.close()
+        self.drain_thread.join()
+        self.listener.close()
+
+
+class TestClientBenchmark(unittest.TestCase):
+    def setUp(self):
+        self.benchmark = BenchmarkClient()
+
+    def tearDown(self):
+        self.benchmark.close()
+
+    def test_serialize_and_send_throughput(self):
+        """Measure serialize+send throughput per format over a persistent connection."""
+        data = {'name': 'John', 'age': 30, 'city': 'New York'}
+        for format_type in ('binary', 'json', 'xml', 'msgpack'):
+            with self.subTest(format_type=format_type):
+                ops_per_second = self.benchmark.run(data, format_type)
+                print(f"{format_type} serialize+send: {ops_per_second:,.0f} ops/sec")
+                self.assertGreater(ops_per_second, 0)
+
+
 class TestClient(unittest.TestCase):
     def test_serialize_data_binary(self):
         """Test serialization of data into binary format and measure performance."""
         data = {'name': 'John', 'age': 30, 'city': 'New York'}
         start_time = time.perf_counter()
-        serialized_data = client.serialize_data(data, 'binary')
-        deserialized_data = pickle.loads(serialized_data)
+        prefix, stream, *buffers = client.serialize_data_parts(data, 'binary')
+        deserialized_data = pickle.loads(stream, buffers=buffers)
         end_time = time.perf_counter()
         print(f"Binary serialization/deserialization time: {end_time - start_time} seconds")
+        # Plain values produce no out-of-band buffers, only a zero count
+        self.assertEqual(client.BUFFER_COUNT.unpack(prefix), (0,))
+        self.assertEqual(buffers, [])
         self.assertEqual(deserialized_data, data)
 
+    def test_serialize_data_parts_binary_out_of_band(self):
+        """Test that PickleBuffer values are sent as separate out-of-band buffers."""
+        data = {'name': 'John', 'blob': pickle.PickleBuffer(b'x' * 1000)}
+        prefix, stream, *buffers = client.serialize_data_parts(data, 'binary')
+        self.assertEqual(client.BUFFER_COUNT.unpack_from(prefix), (1,))
+        self.assertEqual(len(buffers[0]), 1000)
+        deserialized_data = pickle.loads(stream, buffers=buffers)
+        self.assertEqual(bytes(deserialized_data['blob']), b'x' * 1000)
+
     def test_serialize_data_json(self):
         """Test serialization of data into JSON format and measure performance."""
         data = {'name': 'John', 'age': 30, 'city': 'New York'}
@@ -69,19 +137,47 @@ class TestClient(unittest.TestCase):
         print(f"XML serialization/deserialization time: {end_time - start_time} seconds")
         self.assertEqual(deserialized_data, data)
 
+    def test_serialize_data_xml_escaping(self):
+        """Test that XML markup characters in values are escaped."""
+        data = {'name': 'Tom & Jerry', 'city': '<New York>'}
+        root = ET.fromstring(client.serialize_data(data, 'xml'))
+        self.assertEqual({child.tag: child.text for child in root}, data)
+
+    def test_serialize_data_msgpack(self):
+        """Test serialization of data into MessagePack format and measure performance."""
+        data = {'name': 'John', 'age': 30, 'city': 'New York'}
+        start_time = time.perf_counter()
+        serialized_data = client.serialize_data(data, 'msgpack')
+        deserialized_data = msgspec.msgpack.decode(serialized_data)
+        end_time = time.perf_counter()
+        print(f"MessagePack serialization/deserialization time: {end_time - start_time} seconds")
+        self.assertEqual(deserialized_data, data)
+
+    def test_serialize_data_unsupported_format(self):
+        """Test that an unknown format is rejected instead of silently returning None."""
+        with self.assertRaises(ValueError):
+            client.serialize_data({'name': 'John'}, 'yaml')
+
     @patch('socket.socket')
     def test_main(self, mock_socket_class):
         """Test the main function for proper socket usage."""
         mock_socket_instance = MagicMock()
         mock_socket_class.return_value = mock_socket_instance
         mock_socket_instance.connect.return_value = None  # Explicitly return None for clarity
+        mock_socket_instance.sendmsg.side_effect = lambda buffers: sum(map(len, buffers))
 
         # Call the main function
         client.main()
 
         # Verify that connect was called
         mock_socket_instance.connect.assert_called_with(('localhost', 12345))
-        # Add any additional behavior checks such as sendall calls etc.
+        # Verify that Nagle's algorithm was disabled before sending
+        mock_socket_instance.setsockopt.assert_any_call(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        # Verify that the header and both payloads were sent in a single call
+        mock_socket_instance.sendmsg.assert_called_once()
+        header, *payload_parts = mock_socket_instance.sendmsg.call_args[0][0]
+        self.assertEqual(sum(client.HEADER.unpack(header)), sum(map(len, payload_parts)))
+        mock_socket_instance.sendall.assert_not_called()
 
 if __name__ == '__main__':
     unittest.main()
@@ -19,15 +19,31 @@
 # --------------------------------------------------------------------------------
 
 import unittest
+import asyncio
+import errno
 import json
+import multiprocessing
+import pickle
+import selectors
+import socket
+import tempfile
+import time
 from io import StringIO
+from unittest.mock import MagicMock, patch
+import msgspec
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
 import sys
 import os
 
 # Adjust the system path to include the server directory
 project_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 src_dir = os.path.join(project_dir, "src")
-sys.path.append(src_dir)
+if src_dir not in sys.path:
+    sys.path.insert(0, src_dir)
 
 try:
     import server
@@ -36,6 +52,8 @@ try:
 except ModuleNotFoundError:
     print("Failed to import server module. Check the path and existence of server.py.")
 
+PERSON = {"name": "John", "age": 30, "city": "New York"}
+
 
 class ServerTests(unittest.TestCase):
     """Unit tests for server functionality."""
@@ -67,6 +85,23 @@ class ServerTests(unittest.TestCase):
             file = self.simulate_file_open("config.json", "r", config_content)
             json.load(file)
 
+    def test_load_configuration_from_file(self):
+        """Test that load_configuration parses a real file through mmap."""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            config_path = os.path.join(tmp_dir, "config.json")
+            with open(config_path, "w") as file:
+                file.write('{"server_output": "console"}')
+            config = server.load_configuration(config_path)
+        self.assertEqual(config, {"server_output": "console"})
+
+    def test_load_configuration_empty_file(self):
+        """Test that an empty configuration file is reported as invalid JSON."""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            config_path = os.path.join(tmp_dir, "config.json")
+            open(config_path, "w").close()
+            with patch("builtins.print"):
+                self.assertIsNone(server.load_configuration(config_path))
+
     def test_process_incoming_data(self):
         """Test that process_incoming_data returns the correct string based on encryption setting."""
         result = server.process_incoming_data(True)
@@ -83,6 +118,473 @@ class ServerTests(unittest.TestCase):
             "The function should return the expected string when encryption is disabled.",
         )
 
+    def test_deserialize_data_msgpack(self):
+        """Test that a MessagePack dictionary is decoded into a validated Person."""
+        data = {"name": "John", "age": 30, "city": "New York"}
+        person = server.deserialize_data(msgspec.msgpack.encode(data), "msgpack")
+        self.assertEqual(person, server.Person(name="John", age=30, city="New York"))
+
+    def test_deserialize_data_msgpack_invalid(self):
+        """Test that a MessagePack dictionary missing fields is rejected."""
+        with self.assertRaises(msgspec.ValidationError):
+            server.deserialize_data(msgspec.msgpack.encode({"name": "John"}), "msgpack")
+
+    def test_deserialize_data_binary_out_of_band(self):
+        """Test that a pickle stream framed with out-of-band buffers is reassembled."""
+        data = {"name": "John", "blob": pickle.PickleBuffer(b"x" * 1000)}
+        pickle_buffers = []
+        stream = pickle.dumps(data, protocol=5, buffer_callback=pickle_buffers.append)
+        raw_buffers = [bytes(buffer.raw()) for buffer in pickle_buffers]
+        prefix = server.BUFFER_COUNT.pack(len(raw_buffers)) + b"".join(
+            len(buffer).to_bytes(4, "big") for buffer in raw_buffers
+        )
+        received = memoryview(prefix + stream + b"".join(raw_buffers))
+        dictionary = server.deserialize_data(received, "binary")
+        self.assertEqual(dictionary["name"], "John")
+        self.assertEqual(bytes(dictionary["blob"]), b"x" * 1000)
+
+    def test_deserialize_data_binary_rejects_globals(self):
+        """Test that a pickle referencing a callable is refused instead of executed."""
+        stream = pickle.dumps({"command": os.system}, protocol=5)
+        received = server.BUFFER_COUNT.pack(0) + stream
+        with self.assertRaises(pickle.UnpicklingError):
+            server.deserialize_data(received, "binary")
+
+    def test_deserialize_data_xml(self):
+        """Test that an XML dictionary is decoded into a dict of strings."""
+        received = b"<dictionary><name>John</name><city>New York</city></dictionary>"
+        self.assertEqual(
+            server.deserialize_data(received, "xml"), {"name": "John", "city": "New York"}
+        )
+
+    def test_decrypt_message_round_trip(self):
+        """Test that text encrypted with AES-GCM is recovered by the server's decrypt path."""
+        from cryptographyHelper import encrypt_message, generate_key
+
+        key = generate_key()
+        encrypted = encrypt_message("Hello, world!", key)
+        self.assertEqual(server.decrypt_message(encrypted, key), "Hello, world!")
+
+    def test_client_connection_partial_reads(self):
+        """Test that a message arriving in pieces is processed only once it is complete."""
+        dictionary = msgspec.msgpack.encode(PERSON)
+        text = b"Hello, world!"
+        message = server.HEADER.pack(len(dictionary), len(text)) + dictionary + text
+        config = {"dictionary_format": "msgpack", "encrypt_text_file": False}
+        sender, receiver = socket.socketpair()
+        receiver.setblocking(False)
+        client = server.ClientConnection(receiver, None)
+        try:
+            with patch("builtins.print") as mock_print:
+                # Nothing to read yet: the non-blocking read must not wait
+                self.assertFalse(client.read(config))
+                sender.sendall(message[:2])
+                self.assertFalse(client.read(config))
+                sender.sendall(message[2:server.HEADER.size + 3])
+                self.assertFalse(client.read(config))
+                self.assertFalse(client.read(config))
+                sender.sendall(message[server.HEADER.size + 3:])
+                self.assertTrue(client.read(config))
+            mock_print.assert_any_call("Received dictionary:", server.Person(**PERSON))
+            mock_print.assert_any_call("Received text:", "Hello, world!")
+        finally:
+            sender.close()
+            receiver.close()
+
+    def test_client_connection_closed_early(self):
+        """Test that a client disconnecting mid-message raises ConnectionError."""
+        sender, receiver = socket.socketpair()
+        receiver.setblocking(False)
+        client = server.ClientConnection(receiver, None)
+        try:
+            sender.sendall(b"short")
+            sender.close()
+            with self.assertRaises(ConnectionError):
+                while not client.read({}):
+                    pass
+        finally:
+            receiver.close()
+
+    def test_process_message_file_output(self):
+        """Test that file output appends each message's payloads as a raw bytes record."""
+        dictionary = msgspec.msgpack.encode(PERSON)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            output_file = os.path.join(tmp_dir, "received_data.txt")
+            config = {
+                "dictionary_format": "msgpack",
+                "encrypt_text_file": False,
+                "server_output": "file",
+                "server_output_file": output_file,
+            }
+            with patch("builtins.print"):
+                server.process_message(config, memoryview(dictionary), memoryview(b"Hello"))
+                server.process_message(config, memoryview(dictionary), memoryview(b"World"))
+            with open(output_file, "rb") as file:
+                self.assertEqual(
+                    file.read(), dictionary + b"\nHello\n" + dictionary + b"\nWorld\n"
+                )
+
+    def test_process_message_encrypted(self):
+        """Test that a key-length-prefixed encrypted payload is split and decrypted."""
+        from cryptographyHelper import encrypt_message, generate_key
+
+        key = generate_key()
+        received_text = server.KEY_HEADER.pack(len(key)) + key + encrypt_message("Hello", key)
+        config = {"dictionary_format": "msgpack", "encrypt_text_file": True}
+        with patch("builtins.print") as mock_print:
+            server.process_message(config, msgspec.msgpack.encode(PERSON), memoryview(received_text))
+        mock_print.assert_any_call("Received encrypted text:", "Hello")
+
+    def test_recv_exact_async(self):
+        """Test that recv_exact_async reads a full message from a non-blocking socket."""
+
+        async def receive(receiver):
+            view = memoryview(bytearray(64))
+            loop = asyncio.get_running_loop()
+            return bytes(await server.recv_exact_async(loop, receiver, view, 13))
+
+        sender, receiver = socket.socketpair()
+        try:
+            receiver.setblocking(False)
+            sender.sendall(b"Hello, world!")
+            self.assertEqual(asyncio.run(receive(receiver)), b"Hello, world!")
+        finally:
+            sender.close()
+            receiver.close()
+
+    def test_handle_connection_async(self):
+        """Test that a framed message is received and processed on the event loop."""
+        dictionary = msgspec.msgpack.encode(PERSON)
+        text = b"Hello, world!"
+        config = {"dictionary_format": "msgpack", "encrypt_text_file": False}
+
+        async def serve(receiver):
+            loop = asyncio.get_running_loop()
+            await server.handle_connection_async(loop, receiver, None, config)
+
+        # A TCP pair rather than socketpair(), since the handler sets TCP options
+        with socket.create_server(("127.0.0.1", 0)) as listener:
+            sender = socket.create_connection(listener.getsockname())
+            receiver, _ = listener.accept()
+        try:
+            receiver.setblocking(False)
+            sender.sendall(server.HEADER.pack(len(dictionary), len(text)) + dictionary + text)
+            with patch("builtins.print") as mock_print:
+                asyncio.run(serve(receiver))
+            mock_print.assert_any_call("Received dictionary:", server.Person(**PERSON))
+            mock_print.assert_any_call("Received text:", "Hello, world!")
+            self.assertEqual(receiver.fileno(), -1)  # The handler closes the connection
+        finally:
+            sender.close()
+            receiver.close()
+
+    def test_handle_connection_async_timeout(self):
+        """Test that a client stalled mid-header is closed once its time runs out."""
+        async def serve(receiver):
+            loop = asyncio.get_running_loop()
+            await server.handle_connection_async(loop, receiver, "client", {})
+
+        with socket.create_server(("127.0.0.1", 0)) as listener:
+            sender = socket.create_connection(listener.getsockname())
+            receiver, _ = listener.accept()
+        try:
+            receiver.setblocking(False)
+            sender.sendall(b"\x00\x00")  # Part of a header, then nothing more
+            with patch.object(server, "CLIENT_TIMEOUT", 0.1), \
+                    patch("builtins.print") as mock_print:
+                asyncio.run(serve(receiver))
+            mock_print.assert_any_call("Connection from client timed out.")
+            self.assertEqual(receiver.fileno(), -1)
+        finally:
+            sender.close()
+            receiver.close()
+
+    def test_accept_pending(self):
+        """Test that every waiting client is accepted and registered in one call."""
+        listener = socket.create_server(("127.0.0.1", 0))
+        listener.setblocking(False)
+        clients = [socket.create_connection(listener.getsockname()) for _ in range(3)]
+        selector = selectors.DefaultSelector()
+        try:
+            with patch("builtins.print"):
+                server.accept_pending(listener, selector)
+            self.assertEqual(len(selector.get_map()), 3)
+        finally:
+            for key in list(selector.get_map().values()):
+                key.fileobj.close()
+            selector.close()
+            for client_socket in clients:
+                client_socket.close()
+            listener.close()
+
+    def test_accept_pending_errors(self):
+        """Test that failed accepts are logged instead of stopping the worker."""
+        listener = MagicMock()
+        selector = MagicMock()
+        listener.accept.side_effect = [OSError(errno.ECONNABORTED, "aborted"), BlockingIOError()]
+        with patch("builtins.print") as mocked_print:
+            self.assertTrue(server.accept_pending(listener, selector))
+        mocked_print.assert_called_once()
+        listener.accept.side_effect = OSError(errno.EMFILE, "Too many open files")
+        with patch("builtins.print"):
+            self.assertFalse(server.accept_pending(listener, selector))
+        selector.register.assert_not_called()
+
+    def test_close_expired(self):
+        """Test that only clients past their deadline are closed."""
+        selector = selectors.DefaultSelector()
+        pairs = [socket.socketpair() for _ in range(2)]
+        clients = [server.ClientConnection(server_side, "client") for server_side, _ in pairs]
+        clients[0].deadline = 0.0
+        for client in clients:
+            selector.register(client.conn, selectors.EVENT_READ, client)
+        try:
+            with patch("builtins.print"):
+                server.close_expired(selector, time.monotonic())
+            self.assertEqual([key.data for key in selector.get_map().values()], [clients[1]])
+            self.assertEqual(clients[0].conn.fileno(), -1)
+        finally:
+            selector.close()
+            for server_side, client_side in pairs:
+                server_side.close()
+                client_side.close()
+
+    @unittest.skipUnless(hasattr(socket, "SO_REUSEPORT"), "SO_REUSEPORT is not available")
+    def test_create_server_socket_reuse_port(self):
+        """Test that two workers can listen on the same port with SO_REUSEPORT."""
+        with patch("builtins.print"):
+            first = server.create_server_socket("127.0.0.1", 0, 1, reuse_port=True)
+            try:
+                port = first.getsockname()[1]
+                second = server.create_server_socket("127.0.0.1", port, 1, reuse_port=True)
+                second.close()
+            finally:
+                first.close()
+
+    @unittest.skipUnless(
+        "fork" in multiprocessing.get_all_start_methods(), "fork start method is not available"
+    )
+    def test_worker_serves_clients_while_one_stalls(self):
+        """Test that a client stalled mid-header does not stop a worker serving others."""
+        with socket.create_server(("127.0.0.1", 0)) as probe:
+            port = probe.getsockname()[1]
+        dictionary = msgspec.msgpack.encode(PERSON)
+        text = b"Hello, world!"
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            output_file = os.path.join(tmp_dir, "received_data.txt")
+            config = {
+                "dictionary_format": "msgpack",
+                "encrypt_text_file": False,
+                "server_output": "file",
+                "server_output_file": output_file,
+            }
+            context = multiprocessing.get_context("fork")
+            process = context.Process(target=server.worker, args=("127.0.0.1", port, config))
+            process.start()
+            stalled = None
+            try:
+                deadline = time.monotonic() + 5
+                while stalled is None:
+                    try:
+                        stalled = socket.create_connection(("127.0.0.1", port))
+                    except ConnectionRefusedError:
+                        if time.monotonic() > deadline:
+                            raise
+                        time.sleep(0.05)
+                stalled.sendall(b"\x00\x00")  # Part of a header, then nothing more
+
+                with socket.create_connection(("127.0.0.1", port)) as client_socket:
+                    client_socket.sendall(
+                        server.HEADER.pack(len(dictionary), len(text)) + dictionary + text
+                    )
+                expected = dictionary + b"\n" + text + b"\n"
+                received = None
+                deadline = time.monotonic() + 5
+                while received != expected and time.monotonic() < deadline:
+                    time.sleep(0.05)
+                    if os.path.exists(output_file):
+                        with open(output_file, "rb") as file:
+                            received = file.read()
+                self.assertEqual(received, expected)
+            finally:
+                if stalled is not None:
+                    stalled.close()
+                process.terminate()
+                process.join()
+
+    @unittest.skipUnless(
+        "fork" in multiprocessing.get_all_start_methods(), "fork start method is not available"
+    )
+    def test_worker_receives_large_out_of_band_message(self):
+        """Test that a client's binary message with a large out-of-band buffer is served."""
+        import client
+
+        blob = os.urandom(200_000)  # Well over a single socket read
+        dict_parts = client.serialize_data_parts({"blob": pickle.PickleBuffer(blob)}, "binary")
+        text = b"Hello, world!"
+        with socket.create_server(("127.0.0.1", 0)) as probe:
+            port = probe.getsockname()[1]
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            output_file = os.path.join(tmp_dir, "received_data.txt")
+            config = {
+                "dictionary_format": "binary",
+                "encrypt_text_file": False,
+                "server_output": "file",
+                "server_output_file": output_file,
+            }
+            context = multiprocessing.get_context("fork")
+            process = context.Process(target=server.worker, args=("127.0.0.1", port, config))
+            process.start()
+            try:
+                deadline = time.monotonic() + 5
+                while True:
+                    try:
+                        client_socket = socket.create_connection(("127.0.0.1", port))
+                        break
+                    except ConnectionRefusedError:
+                        if time.monotonic() > deadline:
+                            raise
+                        time.sleep(0.05)
+                with client_socket:
+                    client.send_message(client_socket, dict_parts, [text])
+                expected = b"".join(dict_parts) + b"\n" + text + b"\n"
+                received = None
+                deadline = time.monotonic() + 5
+                while received != expected and time.monotonic() < deadline:
+                    time.sleep(0.05)
+                    if os.path.exists(output_file):
+                        with open(output_file, "rb") as file:
+                            received = file.read()
+                # The record is only written once the server has decoded the dictionary
+                self.assertEqual(received, expected)
+                dictionary = server.deserialize_data(memoryview(received)[:-len(text) - 2], "binary")
+                self.assertEqual(dictionary, {"blob": blob})
+            finally:
+                process.terminate()
+                process.join()
+
+    @unittest.skipUnless(
+        "fork" in multiprocessing.get_all_start_methods() and resource is not None,
+        "fork start method or resource module is not available",
+    )
+    def test_worker_survives_descriptor_exhaustion(self):
+        """Test that a worker out of descriptors expires idle clients and keeps serving."""
+        with socket.create_server(("127.0.0.1", 0)) as probe:
+            port = probe.getsockname()[1]
+        dictionary = msgspec.msgpack.encode(PERSON)
+        text = b"Hello, world!"
+
+        def limited_worker(config):
+            _, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+            resource.setrlimit(resource.RLIMIT_NOFILE, (40, hard))
+            with patch.object(server, "CLIENT_TIMEOUT", 0.5), \
+                    patch.object(server, "SWEEP_INTERVAL", 0.1), patch("builtins.print"):
+                server.worker("127.0.0.1", port, config)
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            output_file = os.path.join(tmp_dir, "received_data.txt")
+            config = {
+                "dictionary_format": "msgpack",
+                "encrypt_text_file": False,
+                "server_output": "file",
+                "server_output_file": output_file,
+            }
+            context = multiprocessing.get_context("fork")
+            process = context.Process(target=limited_worker, args=(config,))
+            process.start()
+            idle = []
+            try:
+                deadline = time.monotonic() + 5
+                while not idle:
+                    try:
+                        idle.append(socket.create_connection(("127.0.0.1", port)))
+                    except ConnectionRefusedError:
+                        if time.monotonic() > deadline:
+                            raise
+                        time.sleep(0.05)
+                # More idle clients than the worker has descriptors for
+                idle.extend(socket.create_connection(("127.0.0.1", port)) for _ in range(59))
+
+                with socket.create_connection(("127.0.0.1", port)) as client_socket:
+                    client_socket.sendall(
+                        server.HEADER.pack(len(dictionary), len(text)) + dictionary + text
+                    )
+                    expected = dictionary + b"\n" + text + b"\n"
+                    received = None
+                    deadline = time.monotonic() + 10
+                    while received != expected and time.monotonic() < deadline:
+                        time.sleep(0.05)
+                        if os.path.exists(output_file):
+                            with open(output_file, "rb") as file:
+                                received = file.read()
+                self.assertEqual(received, expected)
+                self.assertTrue(process.is_alive())
+            finally:
+                for idle_socket in idle:
+                    idle_socket.close()
+                process.terminate()
+                process.join()
+
+    @unittest.skipUnless(
+        multiprocessing.get_start_method() == "fork", "workers are not started by forking"
+    )
+    def test_run_workers_restarts_crashed_workers(self):
+        """Test that a crashed worker is logged and replaced, and a stopped one is not."""
+        calls = multiprocessing.Value("i", 0)
+
+        def fake_worker(host, port, config, reuse_port):
+            with calls.get_lock():
+                calls.value += 1
+                call = calls.value
+            if call == 1:
+                time.sleep(0.2)
+                os._exit(3)  # Crash once, after running long enough to be restarted
+
+        with patch.object(server, "worker", fake_worker), \
+                patch.object(server, "MIN_WORKER_LIFETIME", 0.1), \
+                patch("builtins.print") as mock_print:
+            server.run_workers("127.0.0.1", 0, {}, 2)
+        self.assertEqual(calls.value, 3)
+        messages = [call.args[0] for call in mock_print.call_args_list]
+        self.assertEqual(len(messages), 1)
+        self.assertTrue(messages[0].endswith("exited with code 3."))
+
+    @unittest.skipUnless(
+        multiprocessing.get_start_method() == "fork", "workers are not started by forking"
+    )
+    def test_run_workers_does_not_restart_failed_start(self):
+        """Test that a worker failing right after starting is not restarted in a loop."""
+        calls = multiprocessing.Value("i", 0)
+
+        def failing_worker(host, port, config, reuse_port):
+            with calls.get_lock():
+                calls.value += 1
+            os._exit(1)
+
+        with patch.object(server, "worker", failing_worker), patch("builtins.print"):
+            server.run_workers("127.0.0.1", 0, {}, 2)
+        self.assertEqual(calls.value, 2)
+
+    def test_accepted_connection_inherits_socket_options(self):
+        """Test that accepted connections inherit TCP_NODELAY and buffer sizes from the listener."""
+        with patch("builtins.print"):
+            listener = server.create_server_socket("127.0.0.1", 0, 1)
+        try:
+            with socket.create_connection(listener.getsockname()):
+                conn, _ = listener.accept()
+                with conn:
+                    self.assertTrue(conn.getsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY))
+                    self.assertGreaterEqual(
+                        conn.getsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF),
+                        server.SOCKET_BUFFER_SIZE,
+                    )
+        finally:
+            listener.close()
+
+    def test_selftest(self):
+        """Test that the AES-GCM known-answer self-test passes."""
+        self.assertIn("self-test passed", server.selftest())
+
 
 if __name__ == "__main__":
     unittest.main()